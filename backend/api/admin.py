@@ -16,6 +16,7 @@ from .models import (
     FeePayment,
     CommunicationType,
     Communication,
+    Job,
 )
 
 # Registra cada modelo para que aparezca en el admin
@@ -33,4 +34,5 @@ admin.site.register(PaymentType)
 admin.site.register(Payment)
 admin.site.register(FeePayment)
 admin.site.register(CommunicationType)
-admin.site.register(Communication)
\ No newline at end of file
+admin.site.register(Communication)
+admin.site.register(Job)
\ No newline at end of file
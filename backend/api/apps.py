@@ -1,6 +1,18 @@
+from importlib import import_module
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Registra los tipos de tarea en segundo plano. django.setup() llama a
+        # ready() tanto en el proceso web como en los procesos de run_jobs, así
+        # que cualquier módulo nuevo con @register_job debe cargarse aquí
+        # (añadiéndolo a settings.JOB_HANDLER_MODULES).
+        from . import jobs  # noqa: F401
+        for module in getattr(settings, 'JOB_HANDLER_MODULES', []):
+            import_module(module)
@@ -0,0 +1,154 @@
+import os
+import socket
+import traceback
+
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Job, Resident
+
+# Registro de tipos de tarea: nombre -> función que recibe el Job
+JOB_HANDLERS = {}
+# Tipos de tarea que solo el personal (is_staff) puede encolar desde la API
+STAFF_ONLY_JOBS = set()
+
+
+def register_job(name, staff_only=False):
+    """
+    Decorador para registrar una función como tipo de tarea en segundo plano.
+    La función recibe la instancia de Job y devuelve un resultado serializable a JSON.
+    El módulo que la define debe ser api.jobs o estar en settings.JOB_HANDLER_MODULES,
+    que ApiConfig.ready() importa; si no, el worker no la conoce y la tarea falla
+    como "Tipo de tarea desconocido".
+    """
+    def decorator(func):
+        JOB_HANDLERS[name] = func
+        if staff_only:
+            STAFF_ONLY_JOBS.add(name)
+        return func
+    return decorator
+
+
+def enqueue(job_type, params=None, created_by=None):
+    """Crea una tarea pendiente para que la procese el worker (manage.py run_jobs)."""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de tarea desconocido: {job_type}")
+    return Job.objects.create(job_type=job_type, params=params or {}, created_by=created_by)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_jobs(limit, worker=''):
+    """
+    Reserva hasta `limit` tareas pendientes y las marca como en ejecución.
+    En PostgreSQL usa SELECT ... FOR UPDATE SKIP LOCKED para que varios workers
+    no tomen la misma fila. SQLite no soporta ese bloqueo: ahí cada tarea se
+    reclama solo con la actualización condicional por estado, fuera de una
+    transacción, para no tener que promover una lectura a escritura mientras
+    los procesos del pool guardan su avance.
+    """
+    if limit <= 0:
+        return []
+
+    pending = Job.objects.filter(status=Job.STATUS_PENDING).order_by('created_at', 'id')
+    if not connection.features.has_select_for_update:
+        candidates = list(pending.values_list('id', flat=True)[:limit])
+        claimed = []
+        for job_id in candidates:
+            try:
+                if _mark_running(job_id, worker):
+                    claimed.append(job_id)
+            except OperationalError:
+                # Base ocupada: devolvemos lo ya reclamado y el resto queda para el siguiente ciclo
+                break
+        return claimed
+
+    with transaction.atomic():
+        candidates = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+        return [job_id for job_id in candidates if _mark_running(job_id, worker)]
+
+
+def _mark_running(job_id, worker):
+    # Solo cambia la fila si sigue pendiente, así nunca se reclama dos veces
+    now = timezone.now()
+    return Job.objects.filter(id=job_id, status=Job.STATUS_PENDING).update(
+        status=Job.STATUS_RUNNING,
+        started_at=now,
+        heartbeat_at=now,
+        worker=worker,
+    )
+
+
+def fail_stale_jobs(older_than, exclude=()):
+    """
+    Marca como fallidas las tareas "en ejecución" sin latido (heartbeat_at) desde
+    hace más de `older_than` (timedelta): su worker murió (SIGKILL, falta de memoria,
+    reinicio) o se interrumpió entre reclamarlas y ejecutarlas. El latido se renueva
+    al reclamar, al empezar y en cada Job.update_progress(). No se reencolan para que
+    una tarea que tumba al worker no se repita indefinidamente.
+    """
+    return (
+        Job.objects.filter(status=Job.STATUS_RUNNING, heartbeat_at__lt=timezone.now() - older_than)
+        .exclude(id__in=exclude)
+        .update(
+            status=Job.STATUS_FAILED,
+            error="Tarea abandonada: el worker dejó de dar señales de vida.",
+            finished_at=timezone.now(),
+        )
+    )
+
+
+def execute_job(job_id):
+    """
+    Ejecuta una tarea ya reclamada. Se llama dentro de un proceso del pool,
+    así que abre y cierra su propia conexión a la base de datos.
+    Tanto el inicio como el resultado se guardan solo si la tarea sigue
+    "en ejecución": si entretanto se dio por abandonada, queda como fallida.
+    """
+    close_old_connections()
+    try:
+        running = Job.objects.filter(id=job_id, status=Job.STATUS_RUNNING)
+        # El pid del proceso hijo permite a run_jobs saber qué tarea tumbó el pool
+        if not running.update(heartbeat_at=timezone.now(), pid=os.getpid()):
+            return Job.objects.get(id=job_id).status
+
+        job = Job.objects.get(id=job_id)
+        handler = JOB_HANDLERS.get(job.job_type)
+        try:
+            if handler is None:
+                raise ValueError(f"Tipo de tarea desconocido: {job.job_type}")
+            result = handler(job)
+        except Exception:
+            outcome = {'status': Job.STATUS_FAILED, 'error': traceback.format_exc(), 'result': None}
+        else:
+            outcome = {'status': Job.STATUS_SUCCEEDED, 'progress': 100, 'result': result}
+
+        if running.update(finished_at=timezone.now(), **outcome):
+            return outcome['status']
+        return Job.objects.get(id=job_id).status
+    finally:
+        close_old_connections()
+
+
+# --- TIPOS DE TAREA ---
+
+@register_job('export_residents', staff_only=True)
+def export_residents(job):
+    """Genera el listado de residentes por unidad para reportes."""
+    residents = Resident.objects.select_related('user', 'unit').order_by('unit__cod')
+    total = residents.count()
+    rows = []
+    for index, resident in enumerate(residents.iterator(), start=1):
+        rows.append({
+            'unidad': resident.unit.cod,
+            'nombre': resident.user.nombre,
+            'apellido': resident.user.apellido,
+            'correo': resident.user.correo,
+            'telefono': resident.user.telefono,
+            'is_principal': resident.is_principal,
+        })
+        if index % 100 == 0:
+            job.update_progress(index * 100 // total, f"{index} de {total} residentes")
+    return {'total': total, 'residents': rows}
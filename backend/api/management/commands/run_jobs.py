@@ -0,0 +1,166 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+from django.utils import timezone
+
+from api.jobs import claim_jobs, execute_job, fail_stale_jobs, worker_name
+from api.models import Job
+from api.worker import init_worker
+
+# Cada cuántos segundos se buscan tareas abandonadas
+REAP_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = "Procesa las tareas en segundo plano (facturación, importaciones, reportes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help="Número de procesos que ejecutan tareas en paralelo.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Segundos de espera cuando no hay tareas pendientes.")
+        parser.add_argument('--once', action='store_true',
+                            help="Procesa las tareas pendientes y termina.")
+        parser.add_argument('--stale-after', type=int, default=60,
+                            help="Minutos sin latido tras los cuales una tarea en ejecución se da por "
+                                 "abandonada y se marca como fallida; 0 lo desactiva.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        name = worker_name()
+        self.stdout.write(f"Worker {name} iniciado con {workers} procesos.")
+
+        stale_after = timedelta(minutes=options['stale_after'])
+        last_reap = None
+        running = {}
+        pool = self._new_pool(workers)
+        try:
+            while True:
+                close_old_connections()
+                if stale_after and (last_reap is None or time.monotonic() - last_reap >= REAP_INTERVAL):
+                    last_reap = time.monotonic()
+                    self._reap(stale_after, running.values())
+
+                claim_failed = False
+                try:
+                    claimed = claim_jobs(workers - len(running), worker=name)
+                except OperationalError as exc:
+                    # Un bloqueo temporal (p. ej. SQLite ocupado) no debe detener el worker
+                    self.stderr.write(f"No se pudieron reclamar tareas: {exc}. Reintentando...")
+                    claimed, claim_failed = [], True
+
+                broken = False
+                for index, job_id in enumerate(claimed):
+                    try:
+                        running[pool.submit(execute_job, job_id)] = job_id
+                    except BrokenProcessPool:
+                        self._requeue(claimed[index:])
+                        broken = True
+                        break
+                # Procesos hijos vivos ahora: si el pool se rompe, su código de salida
+                # indica cuál murió por sí mismo y cuáles cerró el pool.
+                children = {process.pid: process for process in multiprocessing.active_children()}
+
+                if not running and not broken:
+                    if options['once'] and not claim_failed:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                if not broken:
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if isinstance(future.exception(), BrokenProcessPool):
+                            broken = True
+                        else:
+                            self._finish(running.pop(future), future)
+
+                if broken:
+                    pool = self._recover(pool, running, children, workers)
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo worker, esperando tareas en curso...")
+            for future, job_id in running.items():
+                self._finish(job_id, future)
+        finally:
+            pool.shutdown(wait=True)
+
+    def _new_pool(self, workers):
+        # Con "spawn" los procesos hijos no heredan las conexiones abiertas del padre
+        # y configuran Django desde cero al arrancar (ver api/worker.py).
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker)
+
+    def _recover(self, pool, running, children, workers):
+        """
+        Un proceso hijo murió (os._exit, SIGKILL, falta de memoria) y el pool marcó
+        como rotas todas sus tareas. Solo falla la tarea que ejecutaba ese proceso;
+        las demás vuelven a la cola y se crea un pool nuevo.
+        """
+        pool.shutdown(wait=True)
+        broken_jobs = []
+        for future, job_id in running.items():
+            if isinstance(future.exception(), BrokenProcessPool):
+                broken_jobs.append(job_id)
+            else:
+                self._finish(job_id, future)
+        running.clear()
+
+        # Al romperse, el pool cierra el resto de sus procesos con SIGTERM
+        crashed = {
+            pid: process.exitcode for pid, process in children.items()
+            if process.exitcode not in (None, 0, -signal.SIGTERM)
+        }
+        culprits = Job.objects.filter(id__in=broken_jobs, status=Job.STATUS_RUNNING, pid__in=crashed)
+        for job in culprits:
+            Job.objects.filter(id=job.id, status=Job.STATUS_RUNNING).update(
+                status=Job.STATUS_FAILED,
+                error=f"El proceso que ejecutaba la tarea terminó abruptamente (código {crashed[job.pid]}).",
+                finished_at=timezone.now(),
+            )
+            self.stdout.write(f"Tarea #{job.id}: {Job.STATUS_FAILED}")
+
+        requeued = self._requeue(broken_jobs)
+        self.stderr.write(f"Un proceso del pool murió; {requeued} tareas devueltas a la cola. Reiniciando pool...")
+        return self._new_pool(workers)
+
+    def _requeue(self, job_ids):
+        # Devolvemos las tareas a la cola para que las tome este u otro worker
+        return Job.objects.filter(id__in=job_ids, status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_PENDING,
+            started_at=None,
+            heartbeat_at=None,
+            worker='',
+            pid=None,
+        )
+
+    def _reap(self, stale_after, own_jobs):
+        try:
+            reaped = fail_stale_jobs(stale_after, exclude=list(own_jobs))
+        except OperationalError as exc:
+            self.stderr.write(f"No se pudieron revisar tareas abandonadas: {exc}")
+            return
+        if reaped:
+            self.stdout.write(f"{reaped} tareas abandonadas marcadas como fallidas.")
+
+    def _finish(self, job_id, future):
+        # future.exception() espera a la tarea y devuelve el error del proceso hijo;
+        # un Ctrl+C del propio worker mientras espera se propaga y no marca la tarea.
+        exc = future.exception()
+        if exc is None:
+            job_status = future.result()
+        else:
+            # El proceso hijo murió antes de poder guardar el resultado
+            Job.objects.filter(id=job_id, status=Job.STATUS_RUNNING).update(
+                status=Job.STATUS_FAILED,
+                error=repr(exc),
+                finished_at=timezone.now(),
+            )
+            job_status = Job.STATUS_FAILED
+        self.stdout.write(f"Tarea #{job_id}: {job_status}")
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import OperationalError, models
 from django.contrib.auth.models import User as AuthUser
+from django.utils import timezone
 
 # Modelo para Tipos de Usuario (Roles)
 class UserType(models.Model):
@@ -124,4 +125,54 @@ class Communication(models.Model):
     communication_type = models.ForeignKey(CommunicationType, on_delete=models.PROTECT)
 
     def __str__(self):
-        return self.titulo
\ No newline at end of file
+        return self.titulo
+
+# --- Tareas en segundo plano ---
+class Job(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En ejecución'),
+        (STATUS_SUCCEEDED, 'Completada'),
+        (STATUS_FAILED, 'Fallida'),
+    ]
+
+    job_type = models.CharField(max_length=100)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    created_by = models.ForeignKey(AuthUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Tarea #{self.id} {self.job_type} ({self.status})"
+
+    def update_progress(self, progress, message=''):
+        # Guarda solo los campos de avance para no pisar el resto de la fila.
+        # También renueva heartbeat_at, que indica a run_jobs que la tarea sigue
+        # viva: las tareas largas deben llamar a este método periódicamente.
+        # El avance es informativo: si la base está ocupada (SQLite con varios
+        # procesos escribiendo) se omite esta actualización en vez de hacer
+        # fallar la tarea; la siguiente llamada volverá a intentarlo.
+        self.progress = max(0, min(100, int(progress)))
+        self.message = message[:255]
+        self.heartbeat_at = timezone.now()
+        try:
+            self.save(update_fields=['progress', 'message', 'heartbeat_at'])
+        except OperationalError:
+            pass
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User as AuthUser, Group
 from django.contrib.auth.password_validation import validate_password
-from .models import User, Property, Resident, UserType, PropertyType, Visitor, Vehicle, Fee, Payment
+from .models import User, Property, Resident, UserType, PropertyType, Visitor, Vehicle, Fee, Payment, Job
+from .jobs import JOB_HANDLERS
 
 
 # --- SERIALIZADOR DE USUARIO (PARA MOSTRAR DATOS) ---
@@ -125,3 +126,43 @@ class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'job_type',
+            'params',
+            'status',
+            'progress',
+            'message',
+            'result',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = [
+            'status',
+            'progress',
+            'message',
+            'result',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+
+    def validate_job_type(self, value):
+        if value not in JOB_HANDLERS:
+            raise serializers.ValidationError(f"Tipo de tarea desconocido: {value}")
+        return value
+
+
+class JobListSerializer(JobSerializer):
+    # En el listado omitimos el resultado y el error, que pueden ser muy grandes;
+    # se consultan en el detalle de cada tarea.
+    class Meta(JobSerializer.Meta):
+        fields = [field for field in JobSerializer.Meta.fields if field not in ('result', 'error')]
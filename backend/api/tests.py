@@ -1,3 +1,267 @@
-from django.test import TestCase
+# Ejecutar con: python manage.py test api --settings=smartcondo.test_settings
+import os
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User as AuthUser
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .jobs import JOB_HANDLERS, claim_jobs, enqueue, execute_job, fail_stale_jobs, register_job
+from .management.commands import run_jobs
+from .models import Job
+
+
+def _failing_handler(job):
+    raise RuntimeError("fallo de prueba")
+
+
+# Tipos de tarea para las pruebas de run_jobs. Los procesos del pool los
+# registran porque test_settings incluye este módulo en JOB_HANDLER_MODULES.
+@register_job('test_sleep')
+def _sleep_handler(job):
+    time.sleep(job.params.get('seconds', 0))
+    return {'slept': job.params.get('seconds', 0)}
+
+
+@register_job('test_crash')
+def _crash_handler(job):
+    # Simula un proceso que muere sin avisar (SIGKILL, falta de memoria)
+    time.sleep(0.3)
+    os._exit(3)
+
+
+class ClaimJobsTests(TestCase):
+    def setUp(self):
+        self.jobs = [Job.objects.create(job_type='export_residents') for _ in range(3)]
+
+    def test_respects_limit_and_marks_running(self):
+        claimed = claim_jobs(2, worker='w1')
+
+        self.assertEqual(claimed, [self.jobs[0].id, self.jobs[1].id])
+        for job in Job.objects.filter(id__in=claimed):
+            self.assertEqual(job.status, Job.STATUS_RUNNING)
+            self.assertEqual(job.worker, 'w1')
+            self.assertIsNotNone(job.started_at)
+
+    def test_does_not_reclaim_running_jobs(self):
+        first = claim_jobs(2, worker='w1')
+        second = claim_jobs(5, worker='w2')
+
+        self.assertEqual(second, [self.jobs[2].id])
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(claim_jobs(5, worker='w3'), [])
+
+    def test_zero_limit_claims_nothing(self):
+        self.assertEqual(claim_jobs(0), [])
+        self.assertFalse(Job.objects.exclude(status=Job.STATUS_PENDING).exists())
+
+
+@mock.patch('api.jobs.close_old_connections')
+class ExecuteJobTests(TestCase):
+    def test_records_success_and_result(self, _close):
+        job = Job.objects.create(job_type='ok', status=Job.STATUS_RUNNING)
+        with mock.patch.dict(JOB_HANDLERS, {'ok': lambda job: {'total': 3}}):
+            self.assertEqual(execute_job(job.id), Job.STATUS_SUCCEEDED)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.result, {'total': 3})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_records_traceback_when_handler_raises(self, _close):
+        job = Job.objects.create(job_type='boom', status=Job.STATUS_RUNNING)
+        with mock.patch.dict(JOB_HANDLERS, {'boom': _failing_handler}):
+            self.assertEqual(execute_job(job.id), Job.STATUS_FAILED)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn('Traceback', job.error)
+        self.assertIn('fallo de prueba', job.error)
+        self.assertIsNone(job.result)
+
+    def test_reaped_job_stays_failed(self, _close):
+        job = Job.objects.create(job_type='reaped', status=Job.STATUS_RUNNING)
+
+        def reaped_while_running(job):
+            # Simula que otro worker la dio por abandonada mientras se ejecutaba
+            Job.objects.filter(id=job.id).update(status=Job.STATUS_FAILED, error='abandonada')
+            return {'total': 1}
+
+        with mock.patch.dict(JOB_HANDLERS, {'reaped': reaped_while_running}):
+            self.assertEqual(execute_job(job.id), Job.STATUS_FAILED)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIsNone(job.result)
+
+    def test_skips_job_no_longer_running(self, _close):
+        job = Job.objects.create(job_type='ok', status=Job.STATUS_FAILED)
+        handler = mock.Mock()
+        with mock.patch.dict(JOB_HANDLERS, {'ok': handler}):
+            self.assertEqual(execute_job(job.id), Job.STATUS_FAILED)
+        handler.assert_not_called()
+
+    def test_unknown_job_type_fails(self, _close):
+        job = Job.objects.create(job_type='no_existe', status=Job.STATUS_RUNNING)
+
+        self.assertEqual(execute_job(job.id), Job.STATUS_FAILED)
+        job.refresh_from_db()
+        self.assertIn('Tipo de tarea desconocido: no_existe', job.error)
+
+    def test_busy_progress_write_does_not_fail_job(self, _close):
+        job = Job.objects.create(job_type='ok')
+        with mock.patch.object(Job, 'save', side_effect=OperationalError('database is locked')):
+            job.update_progress(50, "mitad")
+        self.assertEqual(job.progress, 50)
+
+
+class FailStaleJobsTests(TestCase):
+    def test_fails_only_jobs_without_recent_heartbeat(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        old = Job.objects.create(job_type='x', status=Job.STATUS_RUNNING,
+                                 started_at=long_ago, heartbeat_at=long_ago)
+        own = Job.objects.create(job_type='x', status=Job.STATUS_RUNNING,
+                                 started_at=long_ago, heartbeat_at=long_ago)
+        # Empezó hace mucho pero sigue informando avance
+        alive = Job.objects.create(job_type='x', status=Job.STATUS_RUNNING,
+                                   started_at=long_ago, heartbeat_at=timezone.now())
+
+        self.assertEqual(fail_stale_jobs(timedelta(hours=1), exclude=[own.id]), 1)
+        old.refresh_from_db()
+        own.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(old.status, Job.STATUS_FAILED)
+        self.assertEqual(own.status, Job.STATUS_RUNNING)
+        self.assertEqual(alive.status, Job.STATUS_RUNNING)
+
+    def test_update_progress_renews_heartbeat(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        job = Job.objects.create(job_type='x', status=Job.STATUS_RUNNING,
+                                 started_at=long_ago, heartbeat_at=long_ago)
+
+        job.update_progress(10)
+
+        self.assertEqual(fail_stale_jobs(timedelta(hours=1)), 0)
+
+
+class JobViewSetTests(TestCase):
+    def setUp(self):
+        self.resident = AuthUser.objects.create_user('residente@example.com', password='x')
+        self.other = AuthUser.objects.create_user('otro@example.com', password='x')
+        self.staff = AuthUser.objects.create_user('admin@example.com', password='x', is_staff=True)
+        self.own_job = Job.objects.create(job_type='export_residents', created_by=self.resident,
+                                          result={'total': 1}, error='')
+        Job.objects.create(job_type='export_residents', created_by=self.other)
+        self.client = APIClient()
+
+    def test_non_staff_only_sees_own_jobs(self):
+        self.client.force_authenticate(self.resident)
+        response = self.client.get('/api/jobs/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([job['id'] for job in response.data], [self.own_job.id])
+
+    def test_staff_sees_all_jobs(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/jobs/')
+
+        self.assertEqual(len(response.data), 2)
+
+    def test_list_omits_result_and_detail_includes_it(self):
+        self.client.force_authenticate(self.resident)
+
+        listed = self.client.get('/api/jobs/').data[0]
+        self.assertNotIn('result', listed)
+        self.assertNotIn('error', listed)
+        detail = self.client.get(f'/api/jobs/{self.own_job.id}/').data
+        self.assertEqual(detail['result'], {'total': 1})
+
+    def test_rejects_unknown_job_type(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post('/api/jobs/', {'job_type': 'no_existe'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('job_type', response.data)
+
+    def test_staff_only_job_forbidden_for_residents(self):
+        self.client.force_authenticate(self.resident)
+        response = self.client.post('/api/jobs/', {'job_type': 'export_residents'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_staff_can_enqueue(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post('/api/jobs/', {'job_type': 'export_residents'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        self.assertEqual(job.created_by, self.staff)
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    def run_command(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('run_jobs', once=True, poll_interval=0.1, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_once_processes_pending_jobs_and_exits(self):
+        jobs = [enqueue('test_sleep') for _ in range(2)]
+
+        stdout, _ = self.run_command(workers=1)
+
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+            self.assertEqual(job.result, {'slept': 0})
+            self.assertIn(f"Tarea #{job.id}: succeeded", stdout)
+
+    def test_retries_when_claim_fails(self):
+        job = enqueue('test_sleep')
+        calls = []
+
+        def busy_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return claim_jobs(*args, **kwargs)
+
+        with mock.patch.object(run_jobs, 'claim_jobs', side_effect=busy_once):
+            _, stderr = self.run_command(workers=1)
+
+        self.assertIn("Reintentando", stderr)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+
+    def test_drains_running_jobs_on_ctrl_c(self):
+        job = enqueue('test_sleep', params={'seconds': 0.5})
+
+        with mock.patch.object(run_jobs, 'wait', side_effect=KeyboardInterrupt):
+            stdout, _ = self.run_command(workers=1)
+
+        self.assertIn("Deteniendo worker", stdout)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+
+    def test_child_crash_fails_only_its_job_and_keeps_working(self):
+        crash = enqueue('test_crash')
+        others = [enqueue('test_sleep', params={'seconds': 1})] + [enqueue('test_sleep') for _ in range(3)]
+
+        stdout, stderr = self.run_command(workers=2)
+
+        crash.refresh_from_db()
+        self.assertEqual(crash.status, Job.STATUS_FAILED)
+        self.assertIn('código 3', crash.error)
+        self.assertIn("Reiniciando pool", stderr)
+        for job in others:
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
@@ -7,6 +7,7 @@ from .views import (
     VehicleViewSet,
     FeeViewSet,
     PaymentViewSet,
+    JobViewSet,
     register,
     user_login,
     get_current_user, # Importamos las nuevas vistas
@@ -20,6 +21,7 @@ router.register(r'visitors', VisitorViewSet)
 router.register(r'vehicles', VehicleViewSet)
 router.register(r'fees', FeeViewSet)
 router.register(r'payments', PaymentViewSet)
+router.register(r'jobs', JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,13 +1,16 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, mixins, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .jobs import STAFF_ONLY_JOBS
+
 # --- Importamos los modelos y serializadores ---
-from .models import Property, Resident, Visitor, Vehicle, Fee, Payment, User
+from .models import Property, Resident, Visitor, Vehicle, Fee, Payment, User, Job
 from .serializers import (
     UserRegistrationSerializer,
     PropertySerializer,
@@ -16,7 +19,9 @@ from .serializers import (
     VehicleSerializer,
     FeeSerializer,
     PaymentSerializer,
-    UserSerializer  # Importante añadir el nuevo UserSerializer
+    UserSerializer,  # Importante añadir el nuevo UserSerializer
+    JobSerializer,
+    JobListSerializer
 )
 
 # --- VISTAS BASADAS EN CLASES (VIEWSETS) ---
@@ -59,6 +64,32 @@ class PaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
+class JobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Encola tareas pesadas (facturación, importaciones, reportes) y consulta su estado.
+    Las tareas las ejecuta el comando `manage.py run_jobs`, no el proceso web.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return JobListSerializer
+        return super().get_serializer_class()
+
+    def perform_create(self, serializer):
+        # El tipo ya es válido; aquí solo se comprueba si el usuario puede encolarlo (403, no 400)
+        if serializer.validated_data['job_type'] in STAFF_ONLY_JOBS and not self.request.user.is_staff:
+            raise PermissionDenied("Solo el personal de administración puede ejecutar esta tarea.")
+        serializer.save(created_by=self.request.user)
+
 
 # --- VISTAS BASADAS EN FUNCIONES ---
 
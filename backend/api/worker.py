@@ -0,0 +1,14 @@
+import signal
+
+import django
+
+
+def init_worker():
+    """
+    Inicializador de los procesos del pool de `manage.py run_jobs`.
+    Este módulo no importa modelos porque se carga antes de django.setup().
+    """
+    # Ctrl+C llega a todo el grupo de procesos: solo el padre debe atenderlo,
+    # los hijos terminan la tarea en curso.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
@@ -122,6 +122,10 @@ if not DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Módulos adicionales con tipos de tarea en segundo plano (@register_job).
+# api.jobs se carga siempre; ver ApiConfig.ready().
+JOB_HANDLER_MODULES = []
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -0,0 +1,23 @@
+# Configuración para ejecutar las pruebas sin PostgreSQL:
+#   python manage.py test api --settings=smartcondo.test_settings
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = SECRET_KEY or 'clave-solo-para-pruebas'
+
+# SQLite en archivo (no en memoria) para que los procesos del pool de run_jobs,
+# que cargan esta misma configuración, vean la base de datos de pruebas.
+TEST_DB = os.path.join(BASE_DIR, 'test_db.sqlite3')
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': TEST_DB,
+        'TEST': {'NAME': TEST_DB},
+    }
+}
+
+# La app api no tiene migraciones versionadas: las tablas se crean desde los modelos.
+MIGRATION_MODULES = {'api': None}
+
+# Tipos de tarea que usan las pruebas de run_jobs.
+JOB_HANDLER_MODULES = ['api.tests']